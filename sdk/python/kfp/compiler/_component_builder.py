@@ -12,65 +12,55 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gzip
+import io
+import hashlib
 import tarfile
 import uuid
 import os
 import inspect
 import re
 import sys
-import tempfile
+import threading
 import logging
-from collections import OrderedDict
 from pathlib import Path
 from ..components._components import _create_task_factory_from_component_spec
+from ..components._python_op import _python_function_name_to_component_name
+from ..components._structures import InputSpec, InputValuePlaceholder, OutputPathPlaceholder, OutputSpec, ContainerImplementation, ContainerSpec, ComponentSpec
+from ..components._yaml_utils import dump_yaml
+from ._container_registry_helper import ContainerRegistryHelper
+from ._gcs_helper import GCSHelper
+from ._k8s_helper import K8sHelper
 
 class VersionedDependency(object):
   """ DependencyVersion specifies the versions """
+  __slots__ = ('name', 'min_version', 'max_version')
+
   def __init__(self, name, version=None, min_version=None, max_version=None):
     """ if version is specified, no need for min_version or max_version;
      if both are specified, version is adopted """
-    self._name = name
+    self.name = name
     if version is not None:
-      self._min_version = version
-      self._max_version = version
+      self.min_version = version
+      self.max_version = version
     else:
-      self._min_version = min_version
-      self._max_version = max_version
-
-  @property
-  def name(self):
-    return self._name
-
-  @property
-  def min_version(self):
-    return self._min_version
-
-  @min_version.setter
-  def min_version(self, min_version):
-    self._min_version = min_version
+      self.min_version = min_version
+      self.max_version = max_version
 
   def has_min_version(self):
-    return self._min_version != None
-
-  @property
-  def max_version(self):
-    return self._max_version
-
-  @max_version.setter
-  def max_version(self, max_version):
-    self._max_version = max_version
+    return self.min_version is not None
 
   def has_max_version(self):
-    return self._max_version != None
+    return self.max_version is not None
 
   def has_versions(self):
-    return (self.has_min_version()) or (self.has_max_version())
+    return self.has_min_version() or self.has_max_version()
 
 class DependencyHelper(object):
   """ DependencyHelper manages software dependency information """
   def __init__(self):
     self._PYTHON_PACKAGE = 'PYTHON_PACKAGE'
-    self._dependency = {self._PYTHON_PACKAGE:OrderedDict()}
+    self._dependency = {self._PYTHON_PACKAGE:{}}
 
   @property
   def python_packages(self):
@@ -90,16 +80,23 @@ class DependencyHelper(object):
     self.python_packages[dependency.name] = dependency
 
   def generate_pip_requirements(self, target_file):
-    """ write the python packages to a requirement file
-    the generated file follows the order of which the packages are added """
+    """ write the python packages to a requirement file """
     with open(target_file, 'w') as f:
-      for name, version in self.python_packages.items():
-        version_str = ''
-        if version.has_min_version():
-          version_str += ' >= ' + version.min_version + ','
-        if version.has_max_version():
-          version_str += ' <= ' + version.max_version + ','
-        f.write(name + version_str.rstrip(',') + '\n')
+      f.write(self.pip_requirements())
+
+  def pip_requirements(self):
+    """ returns the content of the requirement file for the python packages
+    the packages are sorted by name so that the same dependencies always
+    produce the same file content, which keeps the docker layer cache valid """
+    lines = []
+    for name, version in sorted(self.python_packages.items()):
+      specifiers = []
+      if version.has_min_version():
+        specifiers.append('>= ' + version.min_version)
+      if version.has_max_version():
+        specifiers.append('<= ' + version.max_version)
+      lines.append((name + ' ' + ', '.join(specifiers)) if specifiers else name)
+    return ''.join(line + '\n' for line in lines)
 
 def _dependency_to_requirements(dependency=[], filename='requirements.txt'):
   """
@@ -108,10 +105,32 @@ def _dependency_to_requirements(dependency=[], filename='requirements.txt'):
       dependency (list): a list of VersionedDependency, which includes the package name and versions
       filename (str): requirement file name, default as requirements.txt
   """
+  with open(filename, 'w') as f:
+    f.write(_generate_requirements(dependency))
+
+def _generate_requirements(dependency):
+  """ returns the content of the requirement file based on the dependency """
   dependency_helper = DependencyHelper()
   for version in dependency:
     dependency_helper.add_python_package(version)
-  dependency_helper.generate_pip_requirements(filename)
+  return dependency_helper.pip_requirements()
+
+# The python and pip commands of each python_version in the generated dockerfile.
+_DOCKERFILE_PYTHON_COMMANDS = {
+  'python2': ('python', 'pip'),
+  'python3': ('python3', 'pip3'),
+}
+
+_DOCKERFILE_TEMPLATE = '''\
+FROM {base_image}
+RUN apt-get update -y && apt-get install --no-install-recommends -y -q {python} {python}-pip {python}-setuptools && rm -rf /var/lib/apt/lists/*
+{requirement}ADD {entrypoint_filename} /ml/main.py
+ENTRYPOINT ["{python}", "-u", "/ml/main.py"]'''
+
+_DOCKERFILE_REQUIREMENT_TEMPLATE = '''\
+ADD {requirement_filename} /ml/requirements.txt
+RUN {pip} install -r /ml/requirements.txt
+'''
 
 def _generate_dockerfile(filename, base_image, entrypoint_filename, python_version, requirement_filename=None):
   """
@@ -123,156 +142,139 @@ def _generate_dockerfile(filename, base_image, entrypoint_filename, python_versi
       python_version (str): choose python2 or python3
       requirement_filename (str): requirement file name
   """
-  if python_version not in ['python2', 'python3']:
-    raise ValueError('python_version has to be either python2 or python3')
   with open(filename, 'w') as f:
-    f.write('FROM ' + base_image + '\n')
-    if python_version is 'python3':
-      f.write('RUN apt-get update -y && apt-get install --no-install-recommends -y -q python3 python3-pip python3-setuptools\n')
-    else:
-      f.write('RUN apt-get update -y && apt-get install --no-install-recommends -y -q python python-pip python-setuptools\n')
-    if requirement_filename is not None:
-      f.write('ADD ' + requirement_filename + ' /ml/requirements.txt\n')
-      if python_version is 'python3':
-        f.write('RUN pip3 install -r /ml/requirements.txt\n')
-      else:
-        f.write('RUN pip install -r /ml/requirements.txt\n')
-    f.write('ADD ' + entrypoint_filename + ' /ml/main.py\n')
-    if python_version is 'python3':
-      f.write('ENTRYPOINT ["python3", "-u", "/ml/main.py"]')
-    else:
-      f.write('ENTRYPOINT ["python", "-u", "/ml/main.py"]')
-
-class CodeGenerator(object):
-  """ CodeGenerator helps to generate python codes with identation """
-  def __init__(self, indentation='\t'):
-    self._indentation = indentation
-    self._code = []
-    self._level = 0
-
-  def begin(self):
-    self._code = []
-    self._level = 0
-
-  def indent(self):
-    self._level += 1
+    f.write(_generate_dockerfile_content(base_image, entrypoint_filename, python_version, requirement_filename))
 
-  def dedent(self):
-    if self._level == 0:
-      raise Exception('CodeGenerator dedent error')
-    self._level -= 1
-
-  def writeline(self, line):
-    self._code.append(self._indentation * self._level + line)
-
-  def end(self):
-    line_sep = '\n'
-    return line_sep.join(self._code) + line_sep
-
-def _func_to_entrypoint(component_func, python_version='python3'):
+def _generate_dockerfile_content(base_image, entrypoint_filename, python_version, requirement_filename=None):
+  """ returns the content of the dockerfile, see _generate_dockerfile for the arguments """
+  if python_version not in ['python2', 'python3']:
+    raise ValueError('python_version has to be either python2 or python3')
+  python, pip = _DOCKERFILE_PYTHON_COMMANDS[python_version]
+  requirement = ''
+  if requirement_filename is not None:
+    requirement = _DOCKERFILE_REQUIREMENT_TEMPLATE.format(requirement_filename=requirement_filename, pip=pip)
+  return _DOCKERFILE_TEMPLATE.format(base_image=base_image, python=python, requirement=requirement,
+                                     entrypoint_filename=entrypoint_filename)
+
+# Templates of the entrypoint codes generated by _func_to_entrypoint,
+# {i} is substituted with one level of the component source indentation.
+_ENTRYPOINT_WRAPPER_TEMPLATE = '''\
+def {wrapper_name}({params}):
+{i}{output_var} = {func_name}({call_args})
+{i}import os
+{serialization}'''
+
+_ENTRYPOINT_SERIALIZATION_TEMPLATE = '''\
+{i}os.makedirs(os.path.dirname(_output_file))
+{i}with open(_output_file, "w") as data:
+{i}{i}data.write(str(output))
+'''
+
+_ENTRYPOINT_NAMED_TUPLE_SERIALIZATION_TEMPLATE = '''\
+{i}for _output_file, output in zip(_output_files, outputs):
+{i}{i}os.makedirs(os.path.dirname(_output_file))
+{i}{i}with open(_output_file, "w") as data:
+{i}{i}{i}data.write(str(output))
+'''
+
+_ENTRYPOINT_CLI_TEMPLATE = '''\
+import argparse
+parser = argparse.ArgumentParser(description="Parsing arguments")
+{add_arguments}
+args = vars(parser.parse_args())
+
+if __name__ == "__main__":
+{i}{wrapper_name}(**args)
+'''
+
+# The input and output types supported by the component entrypoint.
+_SUPPORTED_TYPES = frozenset([int, float, str, bool])
+
+# The indentation of the first indented line and the function definition line
+# in the component source.
+_INDENTATION_RE = re.compile(r'\n([ \t]+)\w+')
+_FUNCTION_DEF_RE = re.compile(r'^def ', re.MULTILINE)
+
+def _is_supported_type(annotation):
+  # Annotations such as {'GCSPath': {...}} are unhashable and cannot be looked up in the set.
+  return isinstance(annotation, type) and annotation in _SUPPORTED_TYPES
+
+def _func_to_entrypoint(component_func, python_version='python3', spec=None, source=None):
   '''
   args:
     python_version (str): choose python2 or python3, default is python3
+    spec (FullArgSpec): inspect.getfullargspec of the component_func, computed if not given
+    source (str): inspect.getsource of the component_func, read if not given
   '''
   if python_version not in ['python2', 'python3']:
     raise ValueError('python_version has to be either python2 or python3')
 
-  fullargspec = inspect.getfullargspec(component_func)
-  annotations = fullargspec[6]
-  input_args = fullargspec[0]
-  inputs = {}
-  output = None
-  if 'return' in annotations.keys():
-    output = annotations['return']
+  fullargspec = spec or inspect.getfullargspec(component_func)
+  annotations = fullargspec.annotations
+  input_args = fullargspec.args
+  output = annotations.get('return')
   output_is_named_tuple = hasattr(output, '_fields')
-  
-  for key, value in annotations.items():
-    if key != 'return':
-      inputs[key] = value
+  inputs = {key: value for key, value in annotations.items() if key != 'return'}
   if len(input_args) != len(inputs):
     raise Exception('Some input arguments do not contain annotations.')
-  if 'return' in  annotations and annotations['return'] not in [int, 
-        float, str, bool] and not output_is_named_tuple:
+  if 'return' in annotations and not output_is_named_tuple and not _is_supported_type(output):
     raise Exception('Output type not supported and supported types are [int, float, str, bool]')
-  if output_is_named_tuple:
-      types = output._field_types
-      for field in output._fields: #Make sure all elements are supported
-        if types[field] not in [int, float, str, bool]:
-          raise Exception('Output type not supported and supported types are [int, float, str, bool]')
-  
+  #Make sure all elements are supported
+  if output_is_named_tuple and not all(_is_supported_type(t) for t in output.__annotations__.values()):
+    raise Exception('Output type not supported and supported types are [int, float, str, bool]')
+
   # inputs is a dictionary with key of argument name and value of type class
   # output is a type class, e.g. int, str, bool, float, NamedTuple.
 
   # Follow the same indentation with the component source codes.
-  component_src = inspect.getsource(component_func)
-  match = re.search(r'\n([ \t]+)[\w]+', component_src)
+  component_src = source or inspect.getsource(component_func)
+  match = _INDENTATION_RE.search(component_src)
   indentation = match.group(1) if match else '\t'
-  codegen = CodeGenerator(indentation=indentation)
 
-  # Function signature
+  # Wrapper function that deserializes the inputs and serializes the outputs
   new_func_name = 'wrapper_' + component_func.__name__
-  codegen.begin()
-  func_signature = 'def ' + new_func_name + '('
-  for input_arg in input_args:
-    func_signature += input_arg + ','
-  func_signature = func_signature + '_output_files' if output_is_named_tuple else func_signature + '_output_file'
-  func_signature += '):'
-  codegen.writeline(func_signature)
-
-  # Call user function
-  codegen.indent()
-  call_component_func = 'output = ' + component_func.__name__ + '('
-  if output_is_named_tuple:
-    call_component_func = call_component_func.replace('output', 'outputs')
-  for input_arg in input_args:
-    call_component_func += inputs[input_arg].__name__ + '(' + input_arg + '),'
-  call_component_func = call_component_func.rstrip(',')
-  call_component_func += ')'
-  codegen.writeline(call_component_func)
-
-  # Serialize output
-  codegen.writeline('import os')
-  if output_is_named_tuple:
-    codegen.writeline('for _output_file, output in zip(_output_files, outputs):')
-    codegen.indent()
-  codegen.writeline('os.makedirs(os.path.dirname(_output_file))')
-  codegen.writeline('with open(_output_file, "w") as data:')
-  codegen.indent()
-  codegen.writeline('data.write(str(output))')
-  wrapper_code = codegen.end()
+  output_param = '_output_files' if output_is_named_tuple else '_output_file'
+  wrapper_code = _ENTRYPOINT_WRAPPER_TEMPLATE.format(
+      i=indentation,
+      wrapper_name=new_func_name,
+      params=''.join(input_arg + ',' for input_arg in input_args) + output_param,
+      output_var='outputs' if output_is_named_tuple else 'output',
+      func_name=component_func.__name__,
+      call_args=','.join(inputs[input_arg].__name__ + '(' + input_arg + ')' for input_arg in input_args),
+      serialization=(_ENTRYPOINT_NAMED_TUPLE_SERIALIZATION_TEMPLATE if output_is_named_tuple
+                     else _ENTRYPOINT_SERIALIZATION_TEMPLATE).format(i=indentation))
 
   # CLI codes
-  codegen.begin()
-  codegen.writeline('import argparse')
-  codegen.writeline('parser = argparse.ArgumentParser(description="Parsing arguments")')
-  for input_arg in input_args:
-    codegen.writeline('parser.add_argument("' + input_arg + '", type=' + inputs[input_arg].__name__ + ')')
+  add_arguments = ['parser.add_argument("' + input_arg + '", type=' + inputs[input_arg].__name__ + ')' for input_arg in input_args]
   if output_is_named_tuple:
-    codegen.writeline('parser.add_argument("_output_files", type=str, nargs=' + str(len(annotations['return']._fields)) + ')')
+    add_arguments.append('parser.add_argument("_output_files", type=str, nargs=' + str(len(output._fields)) + ')')
   else:
-    codegen.writeline('parser.add_argument("_output_file", type=str)')
-  codegen.writeline('args = vars(parser.parse_args())')
-  codegen.writeline('')
-  codegen.writeline('if __name__ == "__main__":')
-  codegen.indent()
-  codegen.writeline(new_func_name + '(**args)')
+    add_arguments.append('parser.add_argument("_output_file", type=str)')
+  cli_code = _ENTRYPOINT_CLI_TEMPLATE.format(
+      i=indentation,
+      wrapper_name=new_func_name,
+      add_arguments='\n'.join(add_arguments))
 
   # Remove the decorator from the component source
-  src_lines = component_src.split('\n')
-  start_line_num = 0
-  for line in src_lines:
-    if line.startswith('def '):
-      break
-    start_line_num += 1
+  match = _FUNCTION_DEF_RE.search(component_src)
+  dedecorated_component_src = component_src[match.start():] if match else ''
   if python_version == 'python2':
-    src_lines[start_line_num] = 'def ' + component_func.__name__ + '(' + ', '.join((inspect.getfullargspec(component_func).args)) + '):'
-  dedecorated_component_src = '\n'.join(src_lines[start_line_num:])
+    _, line_sep, function_body = dedecorated_component_src.partition('\n')
+    dedecorated_component_src = 'def ' + component_func.__name__ + '(' + ', '.join(input_args) + '):' + line_sep + function_body
   if output_is_named_tuple:
     dedecorated_component_src = 'from typing import NamedTuple\n' + dedecorated_component_src
 
-  complete_component_code = dedecorated_component_src + '\n' + wrapper_code + '\n' + codegen.end()
+  complete_component_code = dedecorated_component_src + '\n' + wrapper_code + '\n' + cli_code
   return complete_component_code
 
+def _default_cache_repo(target_image):
+  """ _default_cache_repo derives the kaniko cache repository from the target image,
+  e.g. gcr.io/project/image:tag -> gcr.io/project/kaniko-cache and image:tag -> image-kaniko-cache """
+  prefix, slash, name = target_image.split('@', 1)[0].rpartition('/')
+  if not slash:
+    return name.split(':', 1)[0] + '-kaniko-cache'
+  return prefix + '/kaniko-cache'
+
 class ImageBuilder(object):
   """ Component Builder. """
   def __init__(self, gcs_base, target_image):
@@ -286,29 +288,21 @@ class ImageBuilder(object):
     self._gcs_path = os.path.join(self._gcs_base, self._tarball_filename)
     self._target_image = target_image
 
-  def _wrap_files_in_tarball(self, tarball_path, files={}):
-    """ _wrap_files_in_tarball creates a tarball for all the input files
-    with the filename configured as the key of files """
-    if not tarball_path.endswith('.tar.gz'):
-      raise ValueError('the tarball path should end with .tar.gz')
-    with tarfile.open(tarball_path, 'w:gz') as tarball:
-      for key, value in files.items():
-        tarball.add(value, arcname=key)
-
-  def _prepare_buildfiles(self, local_tarball_path, docker_filename, python_filename=None, requirement_filename=None):
-    """ _prepare_buildfiles generates the tarball with all the build files
-    Args:
-      local_tarball_path (str): generated tarball file
-      docker_filename (str): docker filename
-      python_filename (str): python filename
-      requirement_filename (str): requirement filename
-    """
-    file_lists =  {self._arc_docker_filename:docker_filename}
-    if python_filename is not None:
-      file_lists[self._arc_python_filename] = python_filename
-    if requirement_filename is not None:
-      file_lists[self._arc_requirement_filename] = requirement_filename
-    self._wrap_files_in_tarball(local_tarball_path, file_lists)
+  def _wrap_files_in_tarball(self, fileobj, files={}):
+    """ _wrap_files_in_tarball writes a gzipped tarball of all the input files to fileobj
+    with the filename configured as the key of files and the content in bytes as the value.
+    The tarball is reproducible: the same files always produce the same bytes. """
+    # The build files are only a few KB, the fastest compression level is enough.
+    with gzip.GzipFile(filename='', mode='wb', compresslevel=1, fileobj=fileobj, mtime=0) as gzip_file:
+      with tarfile.open(fileobj=gzip_file, mode='w') as tarball:
+        for key in sorted(files):
+          info = tarfile.TarInfo(name=key)
+          info.size = len(files[key])
+          info.mtime = 0
+          info.mode = 0o644
+          info.uid = info.gid = 0
+          info.uname = info.gname = ''
+          tarball.addfile(info, io.BytesIO(files[key]))
 
   def _check_gcs_path(self, gcs_path):
     """ _check_gcs_path check both the path validity and write permissions """
@@ -318,8 +312,11 @@ class ImageBuilder(object):
       return False
     return True
 
-  def _generate_kaniko_spec(self, namespace, arc_dockerfile_name, gcs_path, target_image):
-    """_generate_kaniko_yaml generates kaniko job yaml based on a template yaml """
+  def _generate_kaniko_spec(self, namespace, arc_dockerfile_name, gcs_path, target_image, cache_repo=None):
+    """_generate_kaniko_yaml generates kaniko job yaml based on a template yaml
+    if cache_repo is not specified, the cache layers are pushed next to the target image under kaniko-cache """
+    if cache_repo is None:
+      cache_repo = _default_cache_repo(target_image)
     content = {
       'apiVersion': 'v1',
       'metadata': {
@@ -332,6 +329,8 @@ class ImageBuilder(object):
         'containers': [{
           'name': 'kaniko',
           'args': ['--cache=true',
+                   '--cache-repo=' + cache_repo,
+                   '--cache-ttl=168h',
                    '--dockerfile=' + arc_dockerfile_name,
                    '--context=' + gcs_path,
                    '--destination=' + target_image],
@@ -355,59 +354,87 @@ class ImageBuilder(object):
     }
     return content
 
-  def _build_image(self, local_tarball_path, namespace, timeout):
-    from ._gcs_helper import GCSHelper
-    GCSHelper.upload_gcs_file(local_tarball_path, self._gcs_path)
+  def _remove_staging_blob(self):
+    """ _remove_staging_blob removes the uploaded build files, a failure is only logged
+    since it runs in the background after the image is built """
+    try:
+      GCSHelper.remove_gcs_blob(self._gcs_path)
+    except Exception as e:
+      logging.error('Failed to remove the build files {}: {}'.format(self._gcs_path, str(e)))
+
+  def _build_image(self, build_files, namespace, timeout, cache_repo=None):
+    """ _build_image uploads the build files and runs the kaniko job.
+    The build files are a dict of the filenames in the build context to their content in bytes,
+    the tarball is built in memory and uploaded without a local file.
+    The staging blob is removed in the background such that the caller does not wait for it,
+    the returned thread can be joined to wait for the clean up. """
+    logging.info('Generate build files.')
+    tarball = io.BytesIO()
+    self._wrap_files_in_tarball(tarball, build_files)
+    GCSHelper.upload_gcs_fileobj(tarball, self._gcs_path)
     kaniko_spec = self._generate_kaniko_spec(namespace=namespace,
                                              arc_dockerfile_name=self._arc_docker_filename,
                                              gcs_path=self._gcs_path,
-                                             target_image=self._target_image)
+                                             target_image=self._target_image,
+                                             cache_repo=cache_repo)
     # Run kaniko job
     logging.info('Start a kaniko job for build.')
-    from ._k8s_helper import K8sHelper
+    # The helper is created per build: loading the kubernetes config refreshes the
+    # access token, which a helper kept across builds would let expire.
     k8s_helper = K8sHelper()
     k8s_helper.run_job(kaniko_spec, timeout)
     logging.info('Kaniko job complete.')
 
     # Clean up
-    GCSHelper.remove_gcs_blob(self._gcs_path)
+    cleanup_thread = threading.Thread(target=self._remove_staging_blob)
+    cleanup_thread.start()
+    return cleanup_thread
 
-  def build_image_from_func(self, component_func, namespace, base_image, timeout, dependency, python_version='python3'):
+  def build_image_from_func(self, component_func, namespace, base_image, timeout, dependency, python_version='python3', cache_repo=None, spec=None, source=None):
     """ build_image builds an image for the given python function
     args:
       python_version (str): choose python2 or python3, default is python3
+      cache_repo (str): container registry repository for the kaniko layer cache
+      spec (FullArgSpec): inspect.getfullargspec of the component_func, computed if not given
+      source (str): inspect.getsource of the component_func, read if not given
     """
     if python_version not in ['python2', 'python3']:
       raise ValueError('python_version has to be either python2 or python3')
-    with tempfile.TemporaryDirectory() as local_build_dir:
-      # Generate entrypoint and serialization python codes
-      local_python_filepath = os.path.join(local_build_dir, self._arc_python_filename)
-      logging.info('Generate entrypoint and serialization codes.')
-      complete_component_code = _func_to_entrypoint(component_func, python_version)
-      with open(local_python_filepath, 'w') as f:
-        f.write(complete_component_code)
-
-      local_requirement_filepath = os.path.join(local_build_dir, self._arc_requirement_filename)
+    build_files = self._generate_build_files(component_func, base_image, dependency, python_version, spec=spec, source=source)
+    return self._build_image(build_files, namespace, timeout, cache_repo)
+
+  def _generate_build_files(self, component_func, base_image, dependency, python_version, spec=None, source=None):
+    """ _generate_build_files returns the build files of the python function,
+    a dict of the filenames in the build context to their content in bytes """
+    # The build files are generated in memory, nothing is written to the local disk.
+    # Generate entrypoint and serialization python codes
+    logging.info('Generate entrypoint and serialization codes.')
+    python_content = _func_to_entrypoint(component_func, python_version, spec=spec, source=source).encode()
+
+    # Skip the requirement file when there is no dependency such that
+    # the dockerfile does not carry the requirement layers at all.
+    requirement_content = None
+    arc_requirement_filename = None
+    if dependency:
+      arc_requirement_filename = self._arc_requirement_filename
       logging.info('Generate requirement file')
-      _dependency_to_requirements(dependency, local_requirement_filepath)
+      requirement_content = _generate_requirements(dependency).encode()
 
-      local_docker_filepath = os.path.join(local_build_dir, self._arc_docker_filename)
-      _generate_dockerfile(local_docker_filepath, base_image, self._arc_python_filename, python_version, self._arc_requirement_filename)
+    docker_content = _generate_dockerfile_content(base_image, self._arc_python_filename, python_version, arc_requirement_filename).encode()
 
-      # Prepare build files
-      logging.info('Generate build files.')
-      local_tarball_path = os.path.join(local_build_dir, 'docker.tmp.tar.gz')
-      self._prepare_buildfiles(local_tarball_path, local_docker_filepath, local_python_filepath, local_requirement_filepath)
-      self._build_image(local_tarball_path, namespace, timeout)
+    build_files = {
+      self._arc_docker_filename: docker_content,
+      self._arc_python_filename: python_content,
+    }
+    if requirement_content is not None:
+      build_files[self._arc_requirement_filename] = requirement_content
+    return build_files
 
-  def build_image_from_dockerfile(self, docker_filename, timeout, namespace):
+  def build_image_from_dockerfile(self, docker_filename, timeout, namespace, cache_repo=None):
     """ build_image_from_dockerfile builds an image based on the dockerfile """
-    with tempfile.TemporaryDirectory() as local_build_dir:
-      # Prepare build files
-      logging.info('Generate build files.')
-      local_tarball_path = os.path.join(local_build_dir, 'docker.tmp.tar.gz')
-      self._prepare_buildfiles(local_tarball_path, docker_filename=docker_filename)
-      self._build_image(local_tarball_path, namespace, timeout)
+    with open(docker_filename, 'rb') as f:
+      docker_content = f.read()
+    return self._build_image({self._arc_docker_filename: docker_content}, namespace, timeout, cache_repo)
 
 def _configure_logger(logger):
   """ _configure_logger configures the logger such that the info level logs
@@ -428,13 +455,11 @@ def _configure_logger(logger):
   logger.addHandler(info_handler)
   logger.addHandler(error_handler)
 
-def _generate_pythonop(component_func, target_image, target_component_file=None):
+def _generate_pythonop(component_func, target_image, target_component_file=None, spec=None, sig=None):
   """ Generate operator for the pipeline authors
-  The returned value is in fact a function, which should generates a container_op instance. """
-
-  from ..components._python_op import _python_function_name_to_component_name
-  from ..components._structures import InputSpec, InputValuePlaceholder, OutputPathPlaceholder, OutputSpec, ContainerImplementation, ContainerSpec, ComponentSpec
-
+  The returned value is in fact a function, which should generates a container_op instance.
+  spec and sig are the inspect.getfullargspec and inspect.signature of the component_func,
+  they are computed if not given. """
 
   #Component name and description are derived from the function's name and docstribng, but can be overridden by @python_component function decorator
   #The decorator can set the _component_human_name and _component_description attributes. getattr is needed to prevent error when these attributes do not exist.
@@ -442,9 +467,9 @@ def _generate_pythonop(component_func, target_image, target_component_file=None)
   component_description = getattr(component_func, '_component_description', None) or (component_func.__doc__.strip() if component_func.__doc__ else None)
 
   #TODO: Humanize the input/output names
-  input_names = inspect.getfullargspec(component_func)[0]
+  input_names = (spec or inspect.getfullargspec(component_func)).args
 
-  return_ann = inspect.signature(component_func).return_annotation
+  return_ann = (sig or inspect.signature(component_func)).return_annotation
   output_is_named_tuple = hasattr(return_ann, '_fields')
 
   output_names = ['output']
@@ -468,13 +493,29 @@ def _generate_pythonop(component_func, target_image, target_component_file=None)
   
   target_component_file = target_component_file or getattr(component_func, '_component_target_component_file', None)
   if target_component_file:
-    from ..components._yaml_utils import dump_yaml
     component_text = dump_yaml(component_spec.to_dict())
     Path(target_component_file).write_text(component_text)
 
   return _create_task_factory_from_component_spec(component_spec)
 
-def build_python_component(component_func, target_image, base_image=None, dependency=[], staging_gcs_path=None, build_image=True, timeout=600, namespace='kubeflow', target_component_file=None, python_version='python3'):
+def _build_files_digest(build_files):
+  """ _build_files_digest returns a digest of the build files of an image,
+  a dict of the filenames in the build context to their content in bytes """
+  h = hashlib.sha256()
+  for name in sorted(build_files):
+    h.update(name.encode())
+    h.update(str(len(build_files[name])).encode())
+    h.update(build_files[name])
+  return h.hexdigest()[:16]
+
+def _image_with_tag(image, tag):
+  """ _image_with_tag replaces the tag or digest of the image with tag,
+  e.g. gcr.io/project/image:latest -> gcr.io/project/image:tag """
+  image = image.split('@', 1)[0]
+  prefix, slash, name = image.rpartition('/')
+  return prefix + slash + name.split(':', 1)[0] + ':' + tag
+
+def build_python_component(component_func, target_image, base_image=None, dependency=[], staging_gcs_path=None, build_image=True, timeout=600, namespace='kubeflow', target_component_file=None, python_version='python3', cache_repo=None, skip_existing_image=False):
   """ build_component automatically builds a container image for the component_func
   based on the base_image and pushes to the target_image.
 
@@ -489,6 +530,9 @@ def build_python_component(component_func, target_image, base_image=None, depend
     namespace (str): the namespace within which to run the kubernetes kaniko job, default is "kubeflow"
     dependency (list): a list of VersionedDependency, which includes the package name and versions, default is empty
     python_version (str): choose python2 or python3, default is python3
+    cache_repo (str): container registry repository that stores the kaniko layer cache, default is kaniko-cache next to the target_image
+    skip_existing_image (bool): whether to tag the target_image with a digest of the build files and skip the build
+      when that image already exists in the registry. Default is False.
   Raises:
     ValueError: The function is not decorated with python_component decorator or the python_version is neither python2 nor python3
   """
@@ -503,6 +547,11 @@ def build_python_component(component_func, target_image, base_image=None, depend
   if python_version not in ['python2', 'python3']:
     raise ValueError('python_version has to be either python2 or python3')
 
+  # Inspect the component function once for both the image build and the op generation.
+  spec = inspect.getfullargspec(component_func)
+  sig = inspect.signature(component_func)
+  source = inspect.getsource(component_func) if build_image else None
+
   if build_image:
     if staging_gcs_path is None:
       raise ValueError('staging_gcs_path must not be None')
@@ -512,18 +561,24 @@ def build_python_component(component_func, target_image, base_image=None, depend
     if base_image is None:
       raise ValueError('base_image must not be None')
 
-    logging.info('Build an image that is based on ' +
-                                   base_image +
-                                   ' and push the image to ' +
-                                   target_image)
     builder = ImageBuilder(gcs_base=staging_gcs_path, target_image=target_image)
-    builder.build_image_from_func(component_func, namespace=namespace,
-                                  base_image=base_image, timeout=timeout,
-                                  python_version=python_version, dependency=dependency)
-    logging.info('Build component complete.')
-  return _generate_pythonop(component_func, target_image, target_component_file)
+    build_files = builder._generate_build_files(component_func, base_image, dependency, python_version, spec=spec, source=source)
+    if skip_existing_image:
+      target_image = _image_with_tag(target_image, _build_files_digest(build_files))
+      builder = ImageBuilder(gcs_base=staging_gcs_path, target_image=target_image)
 
-def build_docker_image(staging_gcs_path, target_image, dockerfile_path, timeout=600, namespace='kubeflow'):
+    if skip_existing_image and ContainerRegistryHelper.image_exists(target_image):
+      logging.info('Image ' + target_image + ' already exists, skip the build.')
+    else:
+      logging.info('Build an image that is based on ' +
+                                     base_image +
+                                     ' and push the image to ' +
+                                     target_image)
+      builder._build_image(build_files, namespace, timeout, cache_repo)
+      logging.info('Build component complete.')
+  return _generate_pythonop(component_func, target_image, target_component_file, spec=spec, sig=sig)
+
+def build_docker_image(staging_gcs_path, target_image, dockerfile_path, timeout=600, namespace='kubeflow', cache_repo=None):
   """ build_docker_image automatically builds a container image based on the specification in the dockerfile and
   pushes to the target_image.
 
@@ -533,8 +588,9 @@ def build_docker_image(staging_gcs_path, target_image, dockerfile_path, timeout=
     dockerfile_path (str): local path to the dockerfile
     timeout (int): the timeout for the image build(in secs), default is 600 seconds
     namespace (str): the namespace within which to run the kubernetes kaniko job, default is "kubeflow"
+    cache_repo (str): container registry repository that stores the kaniko layer cache, default is kaniko-cache next to the target_image
   """
   _configure_logger(logging.getLogger())
   builder = ImageBuilder(gcs_base=staging_gcs_path, target_image=target_image)
-  builder.build_image_from_dockerfile(docker_filename=dockerfile_path, timeout=timeout, namespace=namespace)
+  builder.build_image_from_dockerfile(docker_filename=dockerfile_path, timeout=timeout, namespace=namespace, cache_repo=cache_repo)
   logging.info('Build image complete.')
@@ -0,0 +1,42 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+class ContainerRegistryHelper(object):
+  """ ContainerRegistryHelper queries images in the container registry """
+
+  @staticmethod
+  def image_exists(image):
+    """ image_exists checks whether the image manifest exists in the registry
+    with the google application default credentials, e.g. gcr.io/project/image:tag.
+    Any failure to query the registry is treated as a missing image. """
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    registry, _, repository = image.partition('/')
+    if '@' in repository:
+      repository, _, reference = repository.partition('@')
+    else:
+      repository, _, reference = repository.rpartition(':')
+    if not registry or not repository or not reference:
+      return False
+    try:
+      credentials, _ = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
+      session = AuthorizedSession(credentials)
+      response = session.head('https://{}/v2/{}/manifests/{}'.format(registry, repository, reference),
+                              headers={'Accept': 'application/vnd.docker.distribution.manifest.v2+json'})
+    except Exception as e:
+      logging.info('Cannot query the image {} in the registry: {}'.format(image, str(e)))
+      return False
+    return response.status_code == 200
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 from pathlib import PurePath
 
 class GCSHelper(object):
@@ -24,15 +25,27 @@ class GCSHelper(object):
     gcs_bucket = pure_path.parts[1]
     gcs_blob = '/'.join(pure_path.parts[2:])
     client = storage.Client()
-    bucket = client.get_bucket(gcs_bucket)
+    # client.bucket does not send a request, unlike client.get_bucket, such that
+    # an upload or a delete only costs the round trip of the operation itself.
+    bucket = client.bucket(gcs_bucket)
     blob = bucket.blob(gcs_blob)
     return blob
 
   @staticmethod
   def upload_gcs_file(local_path, gcs_path):
     blob = GCSHelper.get_blob_from_gcs_uri(gcs_path)
+    # chunk_size is left unset: small files are then sent in a single multipart
+    # request instead of a resumable upload session.
     blob.upload_from_filename(local_path)
 
+  @staticmethod
+  def upload_gcs_fileobj(fileobj, gcs_path):
+    """ upload_gcs_fileobj uploads the content of fileobj from its beginning """
+    blob = GCSHelper.get_blob_from_gcs_uri(gcs_path)
+    # The size is required for the upload to be sent in a single multipart request.
+    size = fileobj.seek(0, os.SEEK_END)
+    blob.upload_from_file(fileobj, rewind=True, size=size)
+
   @staticmethod
   def remove_gcs_blob(gcs_path):
     blob = GCSHelper.get_blob_from_gcs_uri(gcs_path)
@@ -12,12 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from datetime import datetime
 from kubernetes import client as k8s_client
 from kubernetes import config
-import time
+from kubernetes import watch
 import logging
 import re
+import time
 
 from .. import dsl
 
@@ -73,24 +73,34 @@ class K8sHelper(object):
       return '', False
 
   def _wait_for_k8s_job(self, pod_name, yaml_spec, timeout):
-    """ _wait_for_k8s_job waits for the job to complete """
-    status = 'running'
-    start_time = datetime.now()
-    while status in ['pending', 'running']:
-      # Pod pending values: https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/V1PodStatus.md
-      try:
-        api_response = self._corev1.read_namespaced_pod(pod_name, yaml_spec['metadata']['namespace'])
-        status = api_response.status.phase.lower()
-        time.sleep(5)
-        elapsed_time = (datetime.now() - start_time).seconds
-        logging.info('{} seconds: waiting for job to complete'.format(elapsed_time))
-        if elapsed_time > timeout:
-          logging.info('Kubernetes job timeout')
-          return False
-      except k8s_client.rest.ApiException as e:
-        logging.exception('Exception when calling CoreV1Api->read_namespaced_pod: {}\n'.format(str(e)))
-        return False
-    return status == 'succeeded'
+    """ _wait_for_k8s_job waits for the job to complete by watching the pod events """
+    # The server may close the watch before timeout_seconds, so the watch is restarted
+    # from the last seen resource version until the deadline.
+    deadline = time.time() + timeout
+    watch_args = {'field_selector': 'metadata.name=' + pod_name}
+    pod_watch = watch.Watch()
+    try:
+      while True:
+        remaining = int(deadline - time.time())
+        if remaining <= 0:
+          break
+        for event in pod_watch.stream(self._corev1.list_namespaced_pod, yaml_spec['metadata']['namespace'],
+                                      timeout_seconds=remaining, **watch_args):
+          watch_args['resource_version'] = event['object'].metadata.resource_version
+          # Pod pending values: https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/V1PodStatus.md
+          phase = event['object'].status.phase
+          if phase is None:
+            continue
+          status = phase.lower()
+          logging.info('Kubernetes job is {}'.format(status))
+          if status not in ['pending', 'running']:
+            pod_watch.stop()
+            return status == 'succeeded'
+    except k8s_client.rest.ApiException as e:
+      logging.exception('Exception when calling CoreV1Api->list_namespaced_pod: {}\n'.format(str(e)))
+      return False
+    logging.info('Kubernetes job timeout')
+    return False
 
   def _delete_k8s_job(self, pod_name, yaml_spec):
     """ _delete_k8s_job deletes a pod """
@@ -13,17 +13,21 @@
 # limitations under the License.
 
 from kfp.compiler._component_builder import _generate_dockerfile, _dependency_to_requirements, _func_to_entrypoint
-from kfp.compiler._component_builder import CodeGenerator
 from kfp.compiler._component_builder import ImageBuilder
 from kfp.compiler._component_builder import VersionedDependency
 from kfp.compiler._component_builder import DependencyHelper
+from kfp.compiler._component_builder import build_python_component, _build_files_digest, _image_with_tag, _default_cache_repo
+from kfp.compiler._container_registry_helper import ContainerRegistryHelper
 
+import io
+import linecache
 import os
+import typing
 import unittest
+from unittest import mock
 import yaml
 import tarfile
 from pathlib import Path
-import inspect
 from collections import OrderedDict
 from typing import NamedTuple
 
@@ -78,9 +82,9 @@ class TestDependencyHelper(unittest.TestCase):
     dependency_helper.generate_pip_requirements(temp_file)
 
     golden_requirement_payload = '''\
-tensorflow >= 0.10.0, <= 0.11.0
 kubernetes >= 0.6.0
 pytorch <= 0.3.0
+tensorflow >= 0.10.0, <= 0.11.0
 '''
     with open(temp_file, 'r') as f:
       target_requirement_payload = f.read()
@@ -102,9 +106,9 @@ pytorch <= 0.3.0
     dependency_helper.add_python_package(dependency=VersionedDependency(name='pytorch', version='0.3.0'))
     dependency_helper.generate_pip_requirements(temp_file)
     golden_requirement_payload = '''\
-tensorflow >= 0.12.0
 kubernetes >= 0.6.0
 pytorch >= 0.3.0, <= 0.3.0
+tensorflow >= 0.12.0
 '''
     with open(temp_file, 'r') as f:
       target_requirement_payload = f.read()
@@ -138,6 +142,13 @@ def sample_component_func_four() -> NamedTuple(
   output = namedtuple('output', ['a', 'b'])
   return output(1.0, 'test')
 
+def define_in_notebook_cell(cell_name, src):
+  """ defines the add function the way notebooks do, from source registered in linecache """
+  linecache.cache[cell_name] = (len(src), None, src.splitlines(True), cell_name)
+  namespace = {}
+  exec(compile(src, cell_name, 'exec'), namespace)
+  return namespace['add']
+
 class TestGenerator(unittest.TestCase):
   def test_generate_dockerfile(self):
     """ Test generate dockerfile """
@@ -147,12 +158,12 @@ class TestGenerator(unittest.TestCase):
     target_dockerfile = os.path.join(test_data_dir, 'component.temp.dockerfile')
     golden_dockerfile_payload_one = '''\
 FROM gcr.io/ngao-mlpipeline-testing/tensorflow:1.10.0
-RUN apt-get update -y && apt-get install --no-install-recommends -y -q python3 python3-pip python3-setuptools
+RUN apt-get update -y && apt-get install --no-install-recommends -y -q python3 python3-pip python3-setuptools && rm -rf /var/lib/apt/lists/*
 ADD main.py /ml/main.py
 ENTRYPOINT ["python3", "-u", "/ml/main.py"]'''
     golden_dockerfile_payload_two = '''\
 FROM gcr.io/ngao-mlpipeline-testing/tensorflow:1.10.0
-RUN apt-get update -y && apt-get install --no-install-recommends -y -q python3 python3-pip python3-setuptools
+RUN apt-get update -y && apt-get install --no-install-recommends -y -q python3 python3-pip python3-setuptools && rm -rf /var/lib/apt/lists/*
 ADD requirements.txt /ml/requirements.txt
 RUN pip3 install -r /ml/requirements.txt
 ADD main.py /ml/main.py
@@ -160,7 +171,7 @@ ENTRYPOINT ["python3", "-u", "/ml/main.py"]'''
 
     golden_dockerfile_payload_three = '''\
 FROM gcr.io/ngao-mlpipeline-testing/tensorflow:1.10.0
-RUN apt-get update -y && apt-get install --no-install-recommends -y -q python python-pip python-setuptools
+RUN apt-get update -y && apt-get install --no-install-recommends -y -q python python-pip python-setuptools && rm -rf /var/lib/apt/lists/*
 ADD requirements.txt /ml/requirements.txt
 RUN pip install -r /ml/requirements.txt
 ADD main.py /ml/main.py
@@ -200,8 +211,8 @@ ENTRYPOINT ["python", "-u", "/ml/main.py"]'''
     ]
     _dependency_to_requirements(dependencies, filename=temp_file)
     golden_payload = '''\
-tensorflow >= 0.10.0, <= 0.11.0
 kubernetes >= 0.6.0
+tensorflow >= 0.10.0, <= 0.11.0
 '''
     with open(temp_file, 'r') as f:
       target_payload = f.read()
@@ -318,6 +329,34 @@ if __name__ == "__main__":
 '''
     self.assertEqual(golden, generated_codes)
 
+  def test_func_to_entrypoint_redefined_func(self):
+    """ Test a function redefined with different annotations and defaults, as in notebook cells """
+    add = define_in_notebook_cell('<cell-1>', 'def add(a: int, b: int = 1) -> int:\n  return a + b\n')
+    generated_codes = _func_to_entrypoint(component_func=add)
+    self.assertTrue(generated_codes.startswith('def add(a: int, b: int = 1) -> int:\n'))
+    add = define_in_notebook_cell('<cell-2>', 'def add(a: float, b: float = 5) -> float:\n  return a + b\n')
+    generated_codes = _func_to_entrypoint(component_func=add)
+    self.assertTrue(generated_codes.startswith('def add(a: float, b: float = 5) -> float:\n'))
+    self.assertIn('output = add(float(a),float(b))', generated_codes)
+
+  def test_func_to_entrypoint_unsupported_types(self):
+    """ Test entrypoint generation rejects missing and unsupported annotations """
+    def missing_input_annotation(a, b: int) -> int:
+      return b
+    def unsupported_output(a: int) -> list:
+      return [a]
+    def dict_output(a: int) -> {'GCSPath': {'path_type': 'file'}}:
+      return str(a)
+    def unsupported_named_tuple_field(a: int) -> NamedTuple('Outputs', [('x', int), ('y', list)]):
+      return (a, [a])
+    def generic_named_tuple_field(a: int) -> NamedTuple('Outputs', [('x', int), ('y', typing.List[int])]):
+      return (a, [a])
+    for component_func in [missing_input_annotation, unsupported_output, dict_output,
+                           unsupported_named_tuple_field, generic_named_tuple_field]:
+      with self.assertRaises(Exception) as context:
+        _func_to_entrypoint(component_func=component_func)
+      self.assertNotIsInstance(context.exception, TypeError)
+
   def test_func_to_entrypoint_python2(self):
     """ Test entrypoint generation for python2"""
 
@@ -352,50 +391,89 @@ if __name__ == "__main__":
 '''
     self.assertEqual(golden, generated_codes)
 
-# hello function is used by the TestCodeGenerator to verify the auto generated python function
-def hello():
-  print("hello")
-
-class TestCodeGenerator(unittest.TestCase):
-  def test_codegen(self):
-    """ Test code generator a function"""
-    codegen = CodeGenerator(indentation='  ')
-    codegen.begin()
-    codegen.writeline('def hello():')
-    codegen.indent()
-    codegen.writeline('print("hello")')
-    generated_codes = codegen.end()
-    self.assertEqual(generated_codes, inspect.getsource(hello))
-
 class TestImageBuild(unittest.TestCase):
 
   def test_wrap_files_in_tarball(self):
     """ Test wrap files in a tarball """
 
     # prepare
-    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
-    temp_file_one = os.path.join(test_data_dir, 'test_data_one.tmp')
-    temp_file_two = os.path.join(test_data_dir, 'test_data_two.tmp')
-    temp_tarball = os.path.join(test_data_dir, 'test_data.tmp.tar.gz')
-    with open(temp_file_one, 'w') as f:
-      f.write('temporary file one content')
-    with open(temp_file_two, 'w') as f:
-      f.write('temporary file two content')
+    temp_tarball = io.BytesIO()
 
     # check
     builder = ImageBuilder(gcs_base=GCS_BASE, target_image='')
-    builder._wrap_files_in_tarball(temp_tarball, {'dockerfile':temp_file_one, 'main.py':temp_file_two})
-    self.assertTrue(os.path.exists(temp_tarball))
-    with tarfile.open(temp_tarball) as temp_tarball_handle:
+    builder._wrap_files_in_tarball(temp_tarball, {'dockerfile':b'temporary file one content', 'main.py':b'temporary file two content'})
+    temp_tarball.seek(0)
+    with tarfile.open(fileobj=temp_tarball, mode='r:gz') as temp_tarball_handle:
       temp_files = temp_tarball_handle.getmembers()
       self.assertTrue(len(temp_files) == 2)
       for temp_file in temp_files:
         self.assertTrue(temp_file.name in ['dockerfile', 'main.py'])
+      self.assertEqual(temp_tarball_handle.extractfile('dockerfile').read(), b'temporary file one content')
 
-    # clean up
-    os.remove(temp_file_one)
-    os.remove(temp_file_two)
-    os.remove(temp_tarball)
+  def test_wrap_files_in_tarball_reproducible(self):
+    """ Test the same files always produce the same tarball """
+    builder = ImageBuilder(gcs_base=GCS_BASE, target_image='')
+    # gzip and tarfile read the current time, which differs between the two builds.
+    tarball_one = io.BytesIO()
+    with mock.patch('time.time', return_value=1000000000.0):
+      builder._wrap_files_in_tarball(tarball_one, {'dockerfile':b'FROM python:3.6', 'main.py':b'print(1)'})
+    tarball_two = io.BytesIO()
+    with mock.patch('time.time', return_value=1500000000.0):
+      builder._wrap_files_in_tarball(tarball_two, {'main.py':b'print(1)', 'dockerfile':b'FROM python:3.6'})
+    self.assertEqual(tarball_one.getvalue(), tarball_two.getvalue())
+
+  def test_build_image_cleanup(self):
+    """ Test the returned thread removes the uploaded build files """
+    with mock.patch('kfp.compiler._component_builder.GCSHelper') as gcs_helper, \
+         mock.patch('kfp.compiler._component_builder.K8sHelper'):
+      builder = ImageBuilder(gcs_base=GCS_BASE, target_image='gcr.io/mlpipeline/kaniko_image:latest')
+      builder._build_image({'dockerfile': b'FROM python:3.6'}, namespace='kubeflow', timeout=600).join()
+      gcs_helper.remove_gcs_blob.assert_called_once_with(builder._gcs_path)
+
+  def test_build_image_k8s_helper_per_build(self):
+    """ Test each build loads the kubernetes config such that the access token is refreshed """
+    with mock.patch('kfp.compiler._component_builder.GCSHelper'), \
+         mock.patch('kfp.compiler._component_builder.K8sHelper') as k8s_helper:
+      builder = ImageBuilder(gcs_base=GCS_BASE, target_image='gcr.io/mlpipeline/kaniko_image:latest')
+      builder._build_image({'dockerfile': b'FROM python:3.6'}, namespace='kubeflow', timeout=600).join()
+      builder._build_image({'dockerfile': b'FROM python:3.7'}, namespace='kubeflow', timeout=600).join()
+    self.assertEqual(k8s_helper.call_count, 2)
+    self.assertEqual(k8s_helper.return_value.run_job.call_count, 2)
+
+  def test_build_image_cleanup_failure(self):
+    """ Test a failure to remove the uploaded build files is logged """
+    with mock.patch('kfp.compiler._component_builder.GCSHelper') as gcs_helper, \
+         mock.patch('kfp.compiler._component_builder.K8sHelper'):
+      gcs_helper.remove_gcs_blob.side_effect = Exception('permission denied')
+      builder = ImageBuilder(gcs_base=GCS_BASE, target_image='gcr.io/mlpipeline/kaniko_image:latest')
+      with self.assertLogs(level='ERROR') as logs:
+        builder._build_image({'dockerfile': b'FROM python:3.6'}, namespace='kubeflow', timeout=600).join()
+      self.assertIn('permission denied', logs.output[0])
+
+  def _build_image_from_func(self, dependency):
+    """ builds sample_component_func and returns the uploaded build files """
+    with mock.patch('kfp.compiler._component_builder.GCSHelper') as gcs_helper, \
+         mock.patch('kfp.compiler._component_builder.K8sHelper'):
+      builder = ImageBuilder(gcs_base=GCS_BASE, target_image='gcr.io/mlpipeline/kaniko_image:latest')
+      builder.build_image_from_func(sample_component_func, namespace='kubeflow', base_image='python:3.6',
+                                    timeout=600, dependency=dependency).join()
+      tarball, _ = gcs_helper.upload_gcs_fileobj.call_args[0]
+    tarball.seek(0)
+    with tarfile.open(fileobj=tarball, mode='r:gz') as tarball_handle:
+      return {member.name: tarball_handle.extractfile(member).read().decode() for member in tarball_handle.getmembers()}
+
+  def test_build_image_from_func_without_dependency(self):
+    """ Test the requirement file and layers are skipped without dependency """
+    build_files = self._build_image_from_func(dependency=[])
+    self.assertEqual(sorted(build_files), ['dockerfile', 'main.py'])
+    self.assertNotIn('requirements.txt', build_files['dockerfile'])
+
+  def test_build_image_from_func_with_dependency(self):
+    """ Test the requirement file and layers are added with dependency """
+    build_files = self._build_image_from_func(dependency=[VersionedDependency(name='tensorflow', version='1.13.0')])
+    self.assertEqual(sorted(build_files), ['dockerfile', 'main.py', 'requirements.txt'])
+    self.assertIn('ADD requirements.txt /ml/requirements.txt\n', build_files['dockerfile'])
+    self.assertEqual(build_files['requirements.txt'], 'tensorflow >= 1.13.0, <= 1.13.0\n')
 
   def test_generate_kaniko_yaml(self):
     """ Test generating the kaniko job yaml """
@@ -410,4 +488,87 @@ class TestImageBuild(unittest.TestCase):
     with open(os.path.join(test_data_dir, 'kaniko.basic.yaml'), 'r') as f:
       golden = yaml.safe_load(f)
 
-    self.assertEqual(golden, generated_yaml)
\ No newline at end of file
+    self.assertEqual(golden, generated_yaml)
+
+  def test_default_cache_repo(self):
+    """ Test deriving the kaniko cache repository from the target image """
+    self.assertEqual(_default_cache_repo('gcr.io/mlpipeline/kaniko_image'), 'gcr.io/mlpipeline/kaniko-cache')
+    self.assertEqual(_default_cache_repo('gcr.io/mlpipeline/kaniko_image:latest'), 'gcr.io/mlpipeline/kaniko-cache')
+    self.assertEqual(_default_cache_repo('gcr.io/mlpipeline/kaniko_image@sha256:0123'), 'gcr.io/mlpipeline/kaniko-cache')
+    self.assertEqual(_default_cache_repo('localhost:5000/kaniko_image:latest'), 'localhost:5000/kaniko-cache')
+    self.assertEqual(_default_cache_repo('kaniko_image'), 'kaniko_image-kaniko-cache')
+    self.assertEqual(_default_cache_repo('kaniko_image:latest'), 'kaniko_image-kaniko-cache')
+    self.assertEqual(_default_cache_repo('kaniko_image@sha256:0123'), 'kaniko_image-kaniko-cache')
+
+  def test_generate_kaniko_yaml_with_cache_repo(self):
+    """ Test generating the kaniko job yaml with an explicit cache repository """
+    builder = ImageBuilder(gcs_base=GCS_BASE, target_image='')
+    generated_yaml = builder._generate_kaniko_spec(namespace='default', arc_dockerfile_name='dockerfile',
+                                                   gcs_path='gs://mlpipeline/kaniko_build.tar.gz', target_image='gcr.io/mlpipeline/kaniko_image:latest',
+                                                   cache_repo='gcr.io/mlpipeline/cache')
+    self.assertIn('--cache-repo=gcr.io/mlpipeline/cache', generated_yaml['spec']['containers'][0]['args'])
+
+class TestContainerRegistryHelper(unittest.TestCase):
+
+  def _image_exists(self, status_code):
+    with mock.patch('google.auth.default', return_value=(mock.Mock(), 'project')), \
+         mock.patch('google.auth.transport.requests.AuthorizedSession') as session_class:
+      session_class.return_value.head.return_value = mock.Mock(status_code=status_code)
+      exists = ContainerRegistryHelper.image_exists('gcr.io/mlpipeline/kaniko_image:0123')
+      session_class.return_value.head.assert_called_once_with(
+          'https://gcr.io/v2/mlpipeline/kaniko_image/manifests/0123', headers=mock.ANY)
+    return exists
+
+  def test_image_exists(self):
+    """ Test the image manifest is found in the registry """
+    self.assertTrue(self._image_exists(200))
+
+  def test_image_not_exists(self):
+    """ Test the image manifest is missing in the registry """
+    self.assertFalse(self._image_exists(404))
+
+class TestBuildPythonComponent(unittest.TestCase):
+
+  def test_build_files_digest(self):
+    """ Test the digest only depends on the build files """
+    build_files = {'dockerfile': b'FROM python:3.6', 'main.py': b'print(1)'}
+    digest = _build_files_digest(build_files)
+    self.assertEqual(digest, _build_files_digest({'main.py': b'print(1)', 'dockerfile': b'FROM python:3.6'}))
+    self.assertNotEqual(digest, _build_files_digest({'dockerfile': b'FROM python:3.7', 'main.py': b'print(1)'}))
+    self.assertNotEqual(digest, _build_files_digest({'dockerfile': b'FROM python:3.6', 'main.py': b'print(1)', 'requirements.txt': b''}))
+    self.assertNotEqual(digest, _build_files_digest({'dockerfile': b'FROM python:3.6print(1)', 'main.py': b''}))
+
+  def test_image_with_tag(self):
+    """ Test replacing the image tag """
+    self.assertEqual(_image_with_tag('gcr.io/mlpipeline/image', 'abc'), 'gcr.io/mlpipeline/image:abc')
+    self.assertEqual(_image_with_tag('gcr.io/mlpipeline/image:latest', 'abc'), 'gcr.io/mlpipeline/image:abc')
+    self.assertEqual(_image_with_tag('localhost:5000/image@sha256:123', 'abc'), 'localhost:5000/image:abc')
+
+  def _build(self, component_func, image_exists):
+    """ builds the component with skip_existing_image and returns the built target image or None """
+    with mock.patch('kfp.compiler._component_builder.ContainerRegistryHelper.image_exists', return_value=image_exists) as image_exists_mock, \
+         mock.patch.object(ImageBuilder, '_build_image', autospec=True) as build_image:
+      build_python_component(component_func, target_image='gcr.io/mlpipeline/image:latest', base_image='python:3.6',
+                             staging_gcs_path=GCS_BASE, skip_existing_image=True)
+    target_image = image_exists_mock.call_args[0][0]
+    self.assertRegex(target_image, r'^gcr\.io/mlpipeline/image:[0-9a-f]{16}$')
+    if not build_image.called:
+      return None
+    builder, build_files = build_image.call_args[0][:2]
+    self.assertEqual(builder._target_image, target_image)
+    self.assertEqual(target_image, 'gcr.io/mlpipeline/image:' + _build_files_digest(build_files))
+    return target_image
+
+  def test_skip_existing_image(self):
+    """ Test the build is skipped when the image already exists """
+    self.assertIsNone(self._build(sample_component_func, image_exists=True))
+
+  def test_build_missing_image(self):
+    """ Test the image is built with the digest tag when it does not exist """
+    self.assertIsNotNone(self._build(sample_component_func, image_exists=False))
+
+  def test_build_redefined_func(self):
+    """ Test a function redefined with different annotations and defaults gets a different image """
+    image_one = self._build(define_in_notebook_cell('<cell-3>', 'def add(a: int, b: int = 1) -> int:\n  return a + b\n'), image_exists=False)
+    image_two = self._build(define_in_notebook_cell('<cell-4>', 'def add(a: float, b: float = 5) -> float:\n  return a + b\n'), image_exists=False)
+    self.assertNotEqual(image_one, image_two)
\ No newline at end of file
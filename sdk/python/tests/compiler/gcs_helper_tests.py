@@ -0,0 +1,28 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from kfp.compiler._gcs_helper import GCSHelper
+import io
+import unittest
+from unittest import mock
+
+
+class TestGCSHelper(unittest.TestCase):
+  def test_upload_gcs_fileobj(self):
+    fileobj = io.BytesIO(b'build context')
+    fileobj.seek(5)
+    with mock.patch.object(GCSHelper, 'get_blob_from_gcs_uri') as get_blob:
+      GCSHelper.upload_gcs_fileobj(fileobj, 'gs://mlpipeline/kaniko_build.tar.gz')
+    get_blob.assert_called_once_with('gs://mlpipeline/kaniko_build.tar.gz')
+    get_blob.return_value.upload_from_file.assert_called_once_with(fileobj, rewind=True, size=len(b'build context'))
@@ -15,6 +15,7 @@
 from kfp.compiler._k8s_helper import K8sHelper
 from datetime import datetime
 import unittest
+from unittest import mock
 
 
 class TestCompiler(unittest.TestCase):
@@ -31,4 +32,46 @@ class TestCompiler(unittest.TestCase):
       "number": 3,
       "list": [1,2,3],
       "time": now.isoformat()
-    })
\ No newline at end of file
+    })
+
+  def _wait_for_k8s_job(self, streams, times):
+    """ runs _wait_for_k8s_job with a watch stream of pod phases per reconnection and
+    the given clock readings, and returns the result and the watch """
+    with mock.patch.object(K8sHelper, '_configure_k8s', return_value=True), \
+         mock.patch('kfp.compiler._k8s_helper.watch.Watch') as watch_class, \
+         mock.patch('kfp.compiler._k8s_helper.time') as time_module:
+      helper = K8sHelper()
+      helper._corev1 = mock.Mock()
+      time_module.time.side_effect = times
+      watch_class.return_value.stream.side_effect = [
+          iter([{'object': mock.Mock(status=mock.Mock(phase=phase), metadata=mock.Mock(resource_version=version))}
+                for version, phase in phases]) for phases in streams]
+      succ = helper._wait_for_k8s_job('kaniko-abc', {'metadata': {'namespace': 'kubeflow'}}, 600)
+      self.assertEqual(watch_class.return_value.stream.call_args_list[0], mock.call(
+          helper._corev1.list_namespaced_pod, 'kubeflow', field_selector='metadata.name=kaniko-abc', timeout_seconds=600))
+    return succ, watch_class.return_value, helper
+
+  def test_wait_for_k8s_job_succeeded(self):
+    succ, pod_watch, _ = self._wait_for_k8s_job(
+        [[('1', None), ('2', 'Pending'), ('3', 'Running'), ('4', 'Succeeded'), ('5', 'Running')]], [1000, 1000])
+    self.assertTrue(succ)
+    pod_watch.stop.assert_called_once_with()
+
+  def test_wait_for_k8s_job_failed(self):
+    succ, pod_watch, _ = self._wait_for_k8s_job([[('1', 'Pending'), ('2', 'Failed')]], [1000, 1000])
+    self.assertFalse(succ)
+    pod_watch.stop.assert_called_once_with()
+
+  def test_wait_for_k8s_job_reconnect(self):
+    succ, pod_watch, helper = self._wait_for_k8s_job(
+        [[('1', 'Pending'), ('2', 'Running')], [('3', 'Succeeded')]], [1000, 1000, 1250])
+    self.assertTrue(succ)
+    self.assertEqual(pod_watch.stream.call_count, 2)
+    self.assertEqual(pod_watch.stream.call_args, mock.call(
+        helper._corev1.list_namespaced_pod, 'kubeflow', field_selector='metadata.name=kaniko-abc',
+        timeout_seconds=350, resource_version='2'))
+
+  def test_wait_for_k8s_job_timeout(self):
+    succ, pod_watch, _ = self._wait_for_k8s_job([[('1', 'Pending'), ('2', 'Running')]], [1000, 1000, 1600])
+    self.assertFalse(succ)
+    self.assertEqual(pod_watch.stream.call_count, 1)
@@ -18,6 +18,7 @@ import unittest
 
 import compiler_tests
 import component_builder_test
+import gcs_helper_tests
 import k8s_helper_tests
 
 
@@ -25,6 +26,7 @@ if __name__ == '__main__':
   suite = unittest.TestSuite()
   suite.addTests(unittest.defaultTestLoader.loadTestsFromModule(compiler_tests))
   suite.addTests(unittest.defaultTestLoader.loadTestsFromModule(component_builder_test))
+  suite.addTests(unittest.defaultTestLoader.loadTestsFromModule(gcs_helper_tests))
   suite.addTests(unittest.defaultTestLoader.loadTestsFromModule(k8s_helper_tests))
   runner = unittest.TextTestRunner()
   if not runner.run(suite).wasSuccessful():